@@ -0,0 +1,107 @@
+"""USPS rate tables, built once per process on import rather than on every Streamlit rerun."""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Dict, Final
+
+# =========================
+# Configuration / Toggles
+# =========================
+# If you want a smooth +$0.280/oz progression for First-Class 6 oz (instead of 2.305),
+# set this to True. By default we keep your exact seed value.
+CORRECT_FC_6OZ = False
+
+MAX_FLAT_OZ = 12  # extrapolate and support flats 1..12 oz
+
+# =========================
+# Helpers
+# =========================
+def to_cents(x: Decimal) -> float:
+    """Round to 2 decimals (banker's rounding turned OFF)."""
+    return float(x.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP))
+
+def extend_flat_rates_to_12oz(seed: Dict[float, float], step: Decimal) -> Dict[float, float]:
+    """
+    From a {1.0..6.0} seed dict, extend forward with a constant step to 12.0 ounces.
+    Returns a NEW dict with keys 1.0..12.0 (floats) and values rounded to cents.
+    """
+    # The seed keys are continuous 1.0..6.0 by design, so position = ounce - 1
+    out_dec = [Decimal(str(seed[k])) for k in sorted(seed)]
+    while len(out_dec) < MAX_FLAT_OZ:
+        out_dec.append(out_dec[-1] + step)
+    return {float(oz): to_cents(v) for oz, v in enumerate(out_dec, start=1)}
+
+# =========================
+# Seed Tables (your exact values)
+# =========================
+# Letters: single price at 3.5 oz equivalent by sortation level
+LETTER_RATES = {
+    "First-Class Mail": {
+        "automation": {
+            "5-Digit": 0.593,
+            "AADC": 0.641,
+            "Mixed AADC": 0.672
+        }
+    },
+    "Marketing Mail": {
+        "automation": {
+            "5-Digit": 0.372,
+            "AADC": 0.407,
+            "Mixed AADC": 0.433
+        }
+    }
+}
+
+# Flats seed 1..6 oz (your original table)
+FC_FLAT_SEED_1_TO_6 = {
+    1.0: 1.230,
+    2.0: 1.505,
+    3.0: 1.775,
+    4.0: 2.045,
+    5.0: 2.325,
+    # Keep your 6 oz value unless smoothing is turned on
+    6.0: (2.325 + 0.280) if CORRECT_FC_6OZ else 2.305
+}
+
+MM_FLAT_SEED_1_TO_6 = {
+    1.0: 0.986,
+    2.0: 0.986,
+    3.0: 0.986,
+    4.0: 0.986,
+    5.0: 1.073,
+    6.0: 1.119
+}
+
+# Extrapolation steps derived from your table
+FC_STEP = Decimal("0.280")  # First-Class flats step per ounce
+MM_STEP = Decimal("0.046")  # Marketing flats step per ounce
+
+# Build extended flat tables (1..12 oz)
+FC_FLAT_EXTENDED: Final[Dict[float, float]] = extend_flat_rates_to_12oz(FC_FLAT_SEED_1_TO_6, FC_STEP)
+MM_FLAT_EXTENDED: Final[Dict[float, float]] = extend_flat_rates_to_12oz(MM_FLAT_SEED_1_TO_6, MM_STEP)
+
+# =========================
+# Unified Rates Structure
+# =========================
+USPS_RATES: Final[Dict[str, dict]] = {
+    "letter": LETTER_RATES,
+    "flat": {
+        "First-Class Mail": {"automation": FC_FLAT_EXTENDED},
+        "Marketing Mail": {"automation": MM_FLAT_EXTENDED}
+    }
+}
+
+def build_rate_index(rates: Dict[str, dict]) -> Dict[tuple, float]:
+    """
+    Flatten USPS_RATES into {(shape, mail_class, mail_type, key): rate}.
+    Letters are keyed by sortation level, flats by whole ounce (int).
+    """
+    index = {}
+    for shape, classes in rates.items():
+        for mail_class, types in classes.items():
+            for mail_type, table in types.items():
+                for key, rate in table.items():
+                    if shape == "flat":
+                        key = int(key)
+                    index[(shape, mail_class, mail_type, key)] = rate
+    return index
+
+RATE_INDEX: Final[Dict[tuple, float]] = build_rate_index(USPS_RATES)